@@ -3,37 +3,84 @@ FastAPI application for MoodBoard Agent.
 Upload an image and get mood-matched music recommendations.
 """
 
-from fastapi import FastAPI, File, UploadFile, HTTPException, Query
+from fastapi import FastAPI, File, UploadFile, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, ConfigDict
 from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import hashlib
+import logging
+import logging.handlers
 import os
+import queue
+import orjson
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
-from .image_analyzer import ImageMoodAnalyzer
+from .image_analyzer import ImageMoodAnalyzer, create_http_client, sniff_mime
 from .music_matcher import MusicMatcher
 from .mood_classifier import MoodClassifier
 
 
+logger = logging.getLogger(__name__)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves message and traceback formatting to the listener thread."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def configure_logging() -> logging.handlers.QueueListener:
+    """
+    Route package logs through a queue so handler I/O happens off the event loop.
+
+    Returns:
+        Started listener; stop it on shutdown to flush pending records
+    """
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    package_logger = logging.getLogger(__package__ or __name__)
+    package_logger.setLevel(logging.INFO)
+    package_logger.handlers = [
+        h for h in package_logger.handlers if not isinstance(h, DeferredQueueHandler)
+    ]
+    package_logger.addHandler(DeferredQueueHandler(log_queue))
+    package_logger.propagate = False
+
+    listener = logging.handlers.QueueListener(log_queue, handler)
+    listener.start()
+    return listener
+
+
 # Pydantic models for responses
 class MoodAnalysisResponse(BaseModel):
     """Response model for mood analysis."""
+    model_config = ConfigDict(extra="ignore")
+
     primary_mood: str
-    secondary_moods: List[str]
-    confidence: float
-    reasoning: str
-    visual_elements: dict
+    secondary_moods: List[str] = []
+    confidence: Optional[float] = None
+    reasoning: Optional[str] = ""
+    visual_elements: Optional[dict] = {}
 
 
 class TrackInfo(BaseModel):
     """Track information."""
+    model_config = ConfigDict(extra="ignore")
+
     name: str
     artist: str
     album: str
+    uri: str
     url: str
     preview_url: Optional[str]
     duration_ms: int
@@ -42,27 +89,119 @@ class TrackInfo(BaseModel):
 
 class MusicRecommendationResponse(BaseModel):
     """Response model for music recommendations."""
+    model_config = ConfigDict(extra="ignore")
+
     mood: str
     mood_description: str
     track_count: int
-    tracks: List[dict]
+    tracks: List[TrackInfo]
     genres: List[str]
+    audio_attributes: Optional[dict] = None
+
+
+class MultiMoodRecommendationResponse(BaseModel):
+    """Response model for recommendations blended across several moods."""
+    model_config = ConfigDict(extra="ignore")
+
+    primary_mood: str
+    secondary_moods: List[str]
+    track_count: int
+    tracks: List[TrackInfo]
+    genres: List[str]
+
+
+class PlaylistInfo(BaseModel):
+    """Playlist information."""
+    model_config = ConfigDict(extra="ignore")
+
+    name: str
+    description: Optional[str] = ""
+    url: str
+    tracks_total: int
+    owner: Optional[str]
+    image: Optional[str]
+
+
+class PlaylistSearchResponse(BaseModel):
+    """Response model for playlist search."""
+    model_config = ConfigDict(extra="ignore")
+
+    mood: str
+    playlists: List[PlaylistInfo]
 
 
 class FullAnalysisResponse(BaseModel):
     """Complete response with mood analysis and music recommendations."""
-    mood_analysis: dict
-    music_recommendations: dict
-    playlists: Optional[List[dict]] = None
+    model_config = ConfigDict(extra="ignore")
+
+    mood_analysis: MoodAnalysisResponse
+    music_recommendations: MultiMoodRecommendationResponse
+    playlists: Optional[List[PlaylistInfo]] = None
+
+
+# Upload limits. The multipart envelope (boundaries, part headers) adds a
+# little on top of the image itself.
+MAX_IMAGE_BYTES = int(os.getenv("MAX_IMAGE_BYTES", str(10 * 1024 * 1024)))
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+UPLOAD_CHUNK_SIZE = 64 * 1024
+UPLOAD_PATHS = frozenset({"/mood", "/analyze"})
+
+
+class UploadLimitMiddleware:
+    """
+    Reject oversized upload bodies before FastAPI parses the multipart form.
+
+    FastAPI receives and spools the whole form before the endpoint runs, so
+    a size check in the endpoint comes too late to save the upload. This
+    answers 413 straight away when Content-Length is over the limit, and
+    otherwise counts body bytes as they arrive and aborts once it's crossed.
+    """
+
+    def __init__(self, app, paths=UPLOAD_PATHS):
+        self.app = app
+        self.paths = paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        max_body = MAX_IMAGE_BYTES + MULTIPART_OVERHEAD_BYTES
+        detail = f"Image too large (max {MAX_IMAGE_BYTES} bytes)"
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > max_body:
+            response = ORJSONResponse({"detail": detail}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_body:
+                    # Raised inside form parsing; FastAPI re-raises HTTPExceptions
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
 
 
 # Initialize FastAPI app
 app = FastAPI(
     title="MoodBoard Agent API",
     description="Upload an image to detect its mood and get matching music recommendations",
-    version="0.1.0"
+    version="0.1.0",
+    default_response_class=ORJSONResponse
 )
 
+# Cut off oversized uploads while they stream in (innermost, so CORS and
+# gzip still apply to the 413)
+app.add_middleware(UploadLimitMiddleware)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -72,22 +211,98 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress larger JSON responses (e.g. /analyze track lists) for clients that accept gzip
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
 
 # Initialize components (will be set on startup)
 image_analyzer: Optional[ImageMoodAnalyzer] = None
 music_matcher: Optional[MusicMatcher] = None
 
+# Worker threads for blocking calls (spotipy requests, image hashing/resizing)
+EXECUTOR_WORKERS = int(os.getenv("EXECUTOR_WORKERS", "32"))
+
+
+async def read_upload(file: UploadFile) -> bytes:
+    """
+    Read an uploaded image and check its size and type.
+
+    By the time this runs FastAPI has already received and spooled the
+    form, so it only saves copying a bad upload into memory; cutting off
+    oversized request bodies early is UploadLimitMiddleware's job. Files
+    over MAX_IMAGE_BYTES fail with 413 and non-image data with 400 after
+    the first chunk.
+
+    Args:
+        file: Uploaded file
+
+    Returns:
+        File contents as bytes
+    """
+    if file.size is not None and file.size > MAX_IMAGE_BYTES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Image too large (max {MAX_IMAGE_BYTES} bytes)"
+        )
+
+    buf = bytearray()
+    checked = False
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        if len(buf) + len(chunk) > MAX_IMAGE_BYTES:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Image too large (max {MAX_IMAGE_BYTES} bytes)"
+            )
+        buf.extend(chunk)
+
+        if not checked and len(buf) >= 12:
+            if not sniff_mime(bytes(buf[:12])):
+                raise HTTPException(status_code=400, detail="File must be an image")
+            checked = True
+
+    if not checked and not sniff_mime(bytes(buf)):
+        raise HTTPException(status_code=400, detail="File must be an image")
+
+    return bytes(buf)
+
+
+async def search_playlists_or_none(mood_name: str, limit: int) -> Optional[List[dict]]:
+    """Search playlists for a mood, returning None instead of failing the request."""
+    try:
+        return await music_matcher.search_playlist_by_mood_async(mood_name, limit=limit)
+    except Exception:
+        logger.exception("Error fetching playlists for %s", mood_name)
+        return None
+
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize analyzers on startup."""
     global image_analyzer, music_matcher
 
+    app.state.log_listener = configure_logging()
+
+    # Bounded pool used by run_in_executor(None, ...) for all blocking work
+    app.state.executor = ThreadPoolExecutor(
+        max_workers=EXECUTOR_WORKERS,
+        thread_name_prefix="moodboard"
+    )
+    asyncio.get_running_loop().set_default_executor(app.state.executor)
+
     # Determine which vision provider to use
     vision_provider = os.getenv("VISION_PROVIDER", "openai")
 
+    # One pooled HTTP/2 client shared by all vision provider calls
+    app.state.http_client = create_http_client()
+
     try:
-        image_analyzer = ImageMoodAnalyzer(provider=vision_provider)
+        image_analyzer = ImageMoodAnalyzer(
+            provider=vision_provider,
+            cache_size=int(os.getenv("MOOD_CACHE_SIZE", "1024")),
+            cache_distance=int(os.getenv("MOOD_CACHE_DISTANCE", "6")),
+            cache_path=os.getenv("MOOD_CACHE_PATH"),
+            http_client=app.state.http_client
+        )
         print(f"✓ Image analyzer initialized with {vision_provider}")
     except Exception as e:
         print(f"⚠ Image analyzer initialization failed: {e}")
@@ -99,6 +314,23 @@ async def startup_event():
         print(f"⚠ Music matcher initialization failed: {e}")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Persist caches and close shared clients on shutdown."""
+    if image_analyzer:
+        try:
+            image_analyzer.save_cache()
+        except Exception:
+            logger.exception("Failed to save mood cache")
+
+    if music_matcher:
+        music_matcher.close()
+
+    await app.state.http_client.aclose()
+    app.state.executor.shutdown(wait=False)
+    app.state.log_listener.stop()
+
+
 @app.get("/")
 async def root():
     """Root endpoint with API information."""
@@ -125,12 +357,11 @@ async def health_check():
     }
 
 
-@app.get("/moods")
-async def list_moods():
-    """Get list of all available moods with descriptions."""
+def _build_moods_payload() -> bytes:
+    """Serialize the static mood catalogue served by /moods."""
     moods = MoodClassifier.get_all_moods()
 
-    return {
+    return orjson.dumps({
         "moods": [
             {
                 "name": name,
@@ -142,10 +373,50 @@ async def list_moods():
             }
             for name, mood in moods.items()
         ]
-    }
+    })
+
+
+# The mood catalogue never changes at runtime, so serialize and tag it once
+_MOODS_JSON = _build_moods_payload()
+# Weak, because GZipMiddleware may serve a different (compressed) representation
+_MOODS_ETAG = f'W/"{hashlib.sha1(_MOODS_JSON).hexdigest()}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    Check an If-None-Match header against an ETag using weak comparison.
+
+    Args:
+        if_none_match: Raw If-None-Match header value
+        etag: Current ETag, weak or strong
+
+    Returns:
+        True if the header lists a matching tag or is "*"
+    """
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if (tag[2:] if tag.startswith("W/") else tag) == opaque:
+            return True
+    return False
+
 
+@app.get("/moods")
+async def list_moods(request: Request):
+    """Get list of all available moods with descriptions."""
+    if etag_matches(request.headers.get("if-none-match", ""), _MOODS_ETAG):
+        return Response(status_code=304, headers={"ETag": _MOODS_ETAG})
 
-@app.post("/mood")
+    return Response(
+        content=_MOODS_JSON,
+        media_type="application/json",
+        headers={"ETag": _MOODS_ETAG}
+    )
+
+
+@app.post("/mood", response_model=MoodAnalysisResponse)
 async def analyze_mood(file: UploadFile = File(...)):
     """
     Analyze the mood of an uploaded image.
@@ -169,12 +440,12 @@ async def analyze_mood(file: UploadFile = File(...)):
             detail="File must be an image"
         )
 
-    try:
-        # Read image bytes
-        image_bytes = await file.read()
+    # Read image bytes
+    image_bytes = await read_upload(file)
 
+    try:
         # Analyze mood
-        result = image_analyzer.analyze_image_bytes(
+        result = await image_analyzer.analyze_image_bytes_async(
             image_bytes,
             filename=file.filename
         )
@@ -188,7 +459,7 @@ async def analyze_mood(file: UploadFile = File(...)):
         )
 
 
-@app.get("/recommendations/{mood_name}")
+@app.get("/recommendations/{mood_name}", response_model=MusicRecommendationResponse)
 async def get_recommendations(
     mood_name: str,
     limit: int = Query(default=20, ge=1, le=100)
@@ -210,14 +481,14 @@ async def get_recommendations(
         )
 
     # Validate mood exists
-    if mood_name not in MoodClassifier.get_mood_names():
+    if not MoodClassifier.is_valid_mood(mood_name):
         raise HTTPException(
             status_code=404,
             detail=f"Mood '{mood_name}' not found. Use /moods to see available moods."
         )
 
     try:
-        recommendations = music_matcher.get_recommendations_by_mood(
+        recommendations = await music_matcher.get_recommendations_by_mood_async(
             mood_name,
             limit=limit
         )
@@ -230,7 +501,7 @@ async def get_recommendations(
         )
 
 
-@app.post("/analyze")
+@app.post("/analyze", response_model=FullAnalysisResponse)
 async def analyze_full(
     file: UploadFile = File(...),
     track_limit: int = Query(default=20, ge=1, le=100),
@@ -266,33 +537,32 @@ async def analyze_full(
             detail="File must be an image"
         )
 
-    try:
-        # Read image bytes
-        image_bytes = await file.read()
+    # Read image bytes
+    image_bytes = await read_upload(file)
 
+    try:
         # Analyze mood
-        mood_analysis = image_analyzer.analyze_image_bytes(
+        mood_analysis = await image_analyzer.analyze_image_bytes_async(
             image_bytes,
             filename=file.filename
         )
 
-        # Get music recommendations based on detected moods
-        music_recommendations = music_matcher.get_multi_mood_recommendations(
+        # Music recommendations and playlist search only depend on the
+        # detected moods, so run them concurrently
+        pending_recommendations = music_matcher.get_multi_mood_recommendations_async(
             primary_mood=mood_analysis["primary_mood"],
             secondary_moods=mood_analysis.get("secondary_moods", []),
             limit=track_limit
         )
 
         # Optionally get playlist suggestions
-        playlists = None
         if include_playlists:
-            try:
-                playlists = music_matcher.search_playlist_by_mood(
-                    mood_analysis["primary_mood"],
-                    limit=5
-                )
-            except Exception as e:
-                print(f"Error fetching playlists: {e}")
+            music_recommendations, playlists = await asyncio.gather(
+                pending_recommendations,
+                search_playlists_or_none(mood_analysis["primary_mood"], limit=5)
+            )
+        else:
+            music_recommendations, playlists = await pending_recommendations, None
 
         return {
             "mood_analysis": mood_analysis,
@@ -301,16 +571,14 @@ async def analyze_full(
         }
 
     except Exception as e:
-        import traceback
-        print(f"Error during analysis: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("analyze_full failed")
         raise HTTPException(
             status_code=500,
             detail=f"Error during analysis: {str(e)}"
         )
 
 
-@app.get("/playlists/{mood_name}")
+@app.get("/playlists/{mood_name}", response_model=PlaylistSearchResponse)
 async def get_playlists(
     mood_name: str,
     limit: int = Query(default=10, ge=1, le=50)
@@ -332,14 +600,17 @@ async def get_playlists(
         )
 
     # Validate mood exists
-    if mood_name not in MoodClassifier.get_mood_names():
+    if not MoodClassifier.is_valid_mood(mood_name):
         raise HTTPException(
             status_code=404,
             detail=f"Mood '{mood_name}' not found. Use /moods to see available moods."
         )
 
     try:
-        playlists = music_matcher.search_playlist_by_mood(mood_name, limit=limit)
+        playlists = await music_matcher.search_playlist_by_mood_async(
+            mood_name,
+            limit=limit
+        )
         return {"mood": mood_name, "playlists": playlists}
 
     except Exception as e:
@@ -2,64 +2,128 @@
 Image mood analyzer using AI vision models (OpenAI GPT-4V or Anthropic Claude).
 """
 
+import asyncio
 import base64
 import os
-from typing import Dict, List, Optional
+import struct
+from typing import Dict, List, Optional, Tuple
 from pathlib import Path
 from io import BytesIO
 
-from PIL import Image
+from PIL import Image, ImageOps
+import httpx
+import orjson
 import openai
-from anthropic import Anthropic
+from anthropic import Anthropic, AsyncAnthropic
 
 from .mood_classifier import MoodClassifier
+from .image_cache import PerceptualCache
+
+
+# Vision models downscale large images internally, so shrink them before upload
+MAX_IMAGE_EDGE = 1024
+DOWNSCALE_MIN_BYTES = 512 * 1024
+
+# EXIF tag id for camera orientation
+_EXIF_ORIENTATION = 0x0112
+
+# Connection pool shared by concurrent requests to the vision provider
+HTTP_LIMITS = httpx.Limits(
+    max_connections=100,
+    max_keepalive_connections=50,
+    keepalive_expiry=30
+)
+
+# MIME types by file extension and by leading magic bytes
+_MIME_BY_EXT = {
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+    ".gif": "image/gif",
+    ".webp": "image/webp"
+}
+
+_MAGIC = (
+    (b"\x89PNG", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF8", "image/gif"),
+)
+
+# Mood names are static, so the prompt's mood list is joined once
+_MOOD_LIST = ", ".join(MoodClassifier.get_mood_names())
+
+
+def sniff_mime(buf: bytes) -> Optional[str]:
+    """Detect image MIME type from the first bytes of the file."""
+    for magic, mime in _MAGIC:
+        if buf.startswith(magic):
+            return mime
+    if buf[:4] == b"RIFF" and buf[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def _quick_validate(buf: bytes) -> str:
+    """
+    Cheaply validate an image from its first 32 bytes.
+
+    Checks the magic bytes and, for PNG and GIF, that the header declares
+    non-zero dimensions. Corrupt image bodies are left for the provider
+    API to reject.
+
+    Args:
+        buf: Image data (only the header is inspected)
+
+    Returns:
+        Detected MIME type
+
+    Raises:
+        ValueError: If the header is not a supported, well-formed image
+    """
+    header = bytes(buf[:32])
+    image_type = sniff_mime(header)
+    if image_type is None:
+        raise ValueError("Invalid image file: unrecognized format")
+
+    if image_type == "image/png":
+        if len(header) < 24 or header[12:16] != b"IHDR":
+            raise ValueError("Invalid image file: truncated PNG header")
+        width, height = struct.unpack(">II", header[16:24])
+    elif image_type == "image/gif":
+        if len(header) < 10:
+            raise ValueError("Invalid image file: truncated GIF header")
+        width, height = struct.unpack("<HH", header[6:10])
+    else:
+        return image_type
+
+    if not width or not height:
+        raise ValueError("Invalid image file: zero image dimensions")
+    return image_type
+
+
+def _flatten(img: Image.Image) -> Image.Image:
+    """Convert to RGB for JPEG, compositing any transparency onto white."""
+    if img.mode in ("RGBA", "LA", "PA") or (img.mode == "P" and "transparency" in img.info):
+        rgba = img.convert("RGBA")
+        background = Image.new("RGB", rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        return background
+    return img.convert("RGB")
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """Create a pooled HTTP/2 client for vision provider calls."""
+    return httpx.AsyncClient(http2=True, timeout=60.0, limits=HTTP_LIMITS)
 
 
 class ImageMoodAnalyzer:
     """Analyzes images to detect mood using AI vision models."""
 
-    def __init__(self, provider: str = "openai", api_key: Optional[str] = None):
-        """
-        Initialize the image analyzer.
+    # The mood list is static, so the prompt is built once at class load.
+    # Regenerate it if moods ever become configurable at runtime.
+    _PROMPT = f"""Analyze this image and detect its emotional mood/atmosphere.
 
-        Args:
-            provider: "openai" or "anthropic"
-            api_key: API key for the chosen provider (or None to use env var)
-        """
-        self.provider = provider.lower()
-        self.mood_names = MoodClassifier.get_mood_names()
-
-        if self.provider == "openai":
-            self.client = openai.OpenAI(api_key=api_key or os.getenv("OPENAI_API_KEY"))
-        elif self.provider == "anthropic":
-            self.client = Anthropic(api_key=api_key or os.getenv("ANTHROPIC_API_KEY"))
-        else:
-            raise ValueError(f"Unsupported provider: {provider}")
-
-    def _encode_image(self, image_path: str) -> str:
-        """Encode image to base64 string."""
-        with open(image_path, "rb") as image_file:
-            return base64.b64encode(image_file.read()).decode("utf-8")
-
-    def _get_image_type(self, image_path: str) -> str:
-        """Get MIME type from image extension."""
-        ext = Path(image_path).suffix.lower()
-        mime_types = {
-            ".jpg": "image/jpeg",
-            ".jpeg": "image/jpeg",
-            ".png": "image/png",
-            ".gif": "image/gif",
-            ".webp": "image/webp"
-        }
-        return mime_types.get(ext, "image/jpeg")
-
-    def _create_analysis_prompt(self) -> str:
-        """Create the prompt for mood analysis."""
-        mood_list = ", ".join(self.mood_names)
-
-        return f"""Analyze this image and detect its emotional mood/atmosphere.
-
-Available moods: {mood_list}
+Available moods: {_MOOD_LIST}
 
 Analyze the image based on:
 1. Colors (warm/cool tones, saturation, brightness)
@@ -83,20 +147,119 @@ Provide your response in this exact JSON format:
 
 Only use moods from the provided list. Primary mood should be the strongest detected mood. Include 1-2 secondary moods if applicable."""
 
-    def analyze_image_openai(self, image_path: str) -> Dict:
-        """Analyze image using OpenAI GPT-4V."""
-        base64_image = self._encode_image(image_path)
-        image_type = self._get_image_type(image_path)
+    def __init__(
+        self,
+        provider: str = "openai",
+        api_key: Optional[str] = None,
+        cache_size: int = 1024,
+        cache_distance: int = 6,
+        cache_path: Optional[str] = None,
+        http_client: Optional[httpx.AsyncClient] = None
+    ):
+        """
+        Initialize the image analyzer.
 
-        response = self.client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
+        Args:
+            provider: "openai" or "anthropic"
+            api_key: API key for the chosen provider (or None to use env var)
+            cache_size: Maximum number of cached analysis results (0 disables caching)
+            cache_distance: Maximum perceptual-hash Hamming distance for a cache hit
+            cache_path: Optional pickle file used to persist the cache
+            http_client: Shared async HTTP client for provider calls
+                (or None to create a pooled HTTP/2 client)
+        """
+        self.provider = provider.lower()
+        self.mood_names = MoodClassifier.get_mood_names()
+        self._valid_moods = frozenset(MoodClassifier.get_mood_names())
+        self.cache = PerceptualCache(
+            max_size=cache_size,
+            max_distance=cache_distance,
+            path=cache_path
+        ) if cache_size > 0 else None
+
+        if self.provider not in ("openai", "anthropic"):
+            raise ValueError(f"Unsupported provider: {provider}")
+
+        self._owns_http_client = http_client is None
+        self.http_client = http_client or create_http_client()
+
+        if self.provider == "openai":
+            api_key = api_key or os.getenv("OPENAI_API_KEY")
+            self.client = openai.OpenAI(api_key=api_key)
+            self.async_client = openai.AsyncOpenAI(api_key=api_key, http_client=self.http_client)
+        else:
+            api_key = api_key or os.getenv("ANTHROPIC_API_KEY")
+            self.client = Anthropic(api_key=api_key)
+            self.async_client = AsyncAnthropic(api_key=api_key, http_client=self.http_client)
+
+    def _encode_image(self, image_bytes: bytes, image_type: str) -> Tuple[str, str]:
+        """
+        Prepare image bytes for upload and base64-encode them once.
+
+        Args:
+            image_bytes: Image data as bytes
+            image_type: MIME type of image_bytes
+
+        Returns:
+            Tuple of (base64 string, MIME type)
+        """
+        image_bytes, image_type = self._prepare_image(image_bytes, image_type)
+        return base64.b64encode(image_bytes).decode("ascii"), image_type
+
+    def _load_and_encode(self, image_path: str) -> Tuple[str, str]:
+        """Read and validate an image file once, returning its (base64 string, MIME type)."""
+        with open(image_path, "rb") as image_file:
+            image_bytes = image_file.read()
+
+        return self._encode_image(image_bytes, _quick_validate(image_bytes))
+
+    def _prepare_image(self, image_bytes: bytes, image_type: str) -> Tuple[bytes, str]:
+        """
+        Downscale and re-encode large images before sending them to the provider.
+
+        Args:
+            image_bytes: Original image data
+            image_type: Original MIME type
+
+        Returns:
+            Tuple of (image bytes, MIME type) to upload
+        """
+        if len(image_bytes) <= DOWNSCALE_MIN_BYTES:
+            return image_bytes, image_type
+
+        try:
+            with Image.open(BytesIO(image_bytes)) as img:
+                # Re-encoding drops EXIF, so bake the camera orientation into
+                # the pixels first or phone photos reach the model rotated
+                rotated = img.getexif().get(_EXIF_ORIENTATION, 1) != 1
+                img = ImageOps.exif_transpose(img)
+                img.thumbnail((MAX_IMAGE_EDGE, MAX_IMAGE_EDGE), Image.LANCZOS)
+                out = BytesIO()
+                _flatten(img).save(out, "JPEG", quality=85, optimize=True)
+        except Exception:
+            # Let the provider decide what to do with images PIL can't handle
+            return image_bytes, image_type
+
+        # Only keep the original if it's smaller and doesn't rely on EXIF rotation
+        if out.tell() >= len(image_bytes) and not rotated:
+            return image_bytes, image_type
+        return out.getvalue(), "image/jpeg"
+
+    def _get_image_type(self, image_path: str) -> str:
+        """Get MIME type from image extension."""
+        return _MIME_BY_EXT.get(Path(image_path).suffix.lower(), "image/jpeg")
+
+    def _openai_request(self, base64_image: str, image_type: str) -> Dict:
+        """Build the chat completion arguments for OpenAI GPT-4V."""
+        return {
+            "model": "gpt-4o",
+            "messages": [
                 {
                     "role": "user",
                     "content": [
                         {
                             "type": "text",
-                            "text": self._create_analysis_prompt()
+                            "text": self._PROMPT
                         },
                         {
                             "type": "image_url",
@@ -107,24 +270,16 @@ Only use moods from the provided list. Primary mood should be the strongest dete
                     ]
                 }
             ],
-            max_tokens=500,
-            response_format={"type": "json_object"}
-        )
-
-        # Parse the JSON response
-        import json
-        result = json.loads(response.choices[0].message.content)
-        return result
-
-    def analyze_image_anthropic(self, image_path: str) -> Dict:
-        """Analyze image using Anthropic Claude."""
-        base64_image = self._encode_image(image_path)
-        image_type = self._get_image_type(image_path)
+            "max_tokens": 500,
+            "response_format": {"type": "json_object"}
+        }
 
-        message = self.client.messages.create(
-            model="claude-3-opus-20240229",
-            max_tokens=500,
-            messages=[
+    def _anthropic_request(self, base64_image: str, image_type: str) -> Dict:
+        """Build the messages arguments for Anthropic Claude."""
+        return {
+            "model": "claude-3-opus-20240229",
+            "max_tokens": 500,
+            "messages": [
                 {
                     "role": "user",
                     "content": [
@@ -138,18 +293,97 @@ Only use moods from the provided list. Primary mood should be the strongest dete
                         },
                         {
                             "type": "text",
-                            "text": self._create_analysis_prompt()
+                            "text": self._PROMPT
                         }
                     ],
                 }
             ],
+        }
+
+    def analyze_image_openai(self, base64_image: str, image_type: str) -> Dict:
+        """Analyze image using OpenAI GPT-4V."""
+        response = self.client.chat.completions.create(
+            **self._openai_request(base64_image, image_type)
+        )
+
+        # Parse the JSON response
+        return orjson.loads(response.choices[0].message.content)
+
+    def analyze_image_anthropic(self, base64_image: str, image_type: str) -> Dict:
+        """Analyze image using Anthropic Claude."""
+        message = self.client.messages.create(
+            **self._anthropic_request(base64_image, image_type)
+        )
+
+        # Parse the JSON response
+        return orjson.loads(message.content[0].text)
+
+    async def analyze_image_openai_async(self, base64_image: str, image_type: str) -> Dict:
+        """Analyze image using OpenAI GPT-4V without blocking the event loop."""
+        response = await self.async_client.chat.completions.create(
+            **self._openai_request(base64_image, image_type)
+        )
+
+        # Parse the JSON response
+        return orjson.loads(response.choices[0].message.content)
+
+    async def analyze_image_anthropic_async(self, base64_image: str, image_type: str) -> Dict:
+        """Analyze image using Anthropic Claude without blocking the event loop."""
+        message = await self.async_client.messages.create(
+            **self._anthropic_request(base64_image, image_type)
         )
 
         # Parse the JSON response
-        import json
-        result = json.loads(message.content[0].text)
+        return orjson.loads(message.content[0].text)
+
+    def _validate_result(self, result: Dict) -> Dict:
+        """
+        Coerce the model's reply into the documented result shape.
+
+        Ensures the returned moods are in our list, and replaces null or
+        mistyped fields with defaults so a loose reply can't fail response
+        validation downstream.
+        """
+        if result.get("primary_mood") not in self._valid_moods:
+            # Default to calm if invalid mood returned
+            result["primary_mood"] = "calm"
+
+        secondary_moods = result.get("secondary_moods")
+        result["secondary_moods"] = [
+            m for m in secondary_moods
+            if isinstance(m, str) and m in self._valid_moods
+        ] if isinstance(secondary_moods, list) else []
+
+        try:
+            result["confidence"] = float(result["confidence"])
+        except (KeyError, TypeError, ValueError):
+            result["confidence"] = None
+
+        if not isinstance(result.get("reasoning"), str):
+            result["reasoning"] = ""
+        if not isinstance(result.get("visual_elements"), dict):
+            result["visual_elements"] = {}
+
         return result
 
+    def _analyze(self, base64_image: str, image_type: str) -> Dict:
+        """Run the configured provider on an encoded image and sanitize the result."""
+        if self.provider == "openai":
+            result = self.analyze_image_openai(base64_image, image_type)
+        else:
+            result = self.analyze_image_anthropic(base64_image, image_type)
+
+        return self._validate_result(result)
+
+    async def _analyze_async(self, base64_image: str, image_type: str) -> Dict:
+        """Async counterpart of _analyze using the provider's async client."""
+        if self.provider == "openai":
+            result = await self.analyze_image_openai_async(base64_image, image_type)
+        else:
+            result = await self.analyze_image_anthropic_async(base64_image, image_type)
+
+        return self._validate_result(result)
+
     def analyze_image(self, image_path: str) -> Dict:
         """
         Analyze an image to detect its mood.
@@ -164,52 +398,76 @@ Only use moods from the provided list. Primary mood should be the strongest dete
         if not os.path.exists(image_path):
             raise FileNotFoundError(f"Image not found: {image_path}")
 
-        # Validate image can be opened
-        try:
-            with Image.open(image_path) as img:
-                img.verify()
-        except Exception as e:
-            raise ValueError(f"Invalid image file: {e}")
+        return self._analyze(*self._load_and_encode(image_path))
 
-        # Analyze based on provider
-        if self.provider == "openai":
-            result = self.analyze_image_openai(image_path)
-        else:
-            result = self.analyze_image_anthropic(image_path)
+    def analyze_image_bytes(self, image_bytes: bytes, filename: str = "image.jpg") -> Dict:
+        """
+        Analyze an image from bytes (useful for API uploads).
 
-        # Validate moods are in our list
-        if result["primary_mood"] not in self.mood_names:
-            # Default to calm if invalid mood returned
-            result["primary_mood"] = "calm"
+        Args:
+            image_bytes: Image data as bytes
+            filename: Original filename (fallback for type detection)
 
-        result["secondary_moods"] = [
-            m for m in result.get("secondary_moods", [])
-            if m in self.mood_names
-        ]
+        Returns:
+            Dictionary containing mood analysis results
+        """
+        # Near-duplicate images reuse a previous analysis
+        cache_key = None
+        if self.cache is not None:
+            cache_key, cached = self.cache.lookup(image_bytes)
+            if cached is not None:
+                return cached
+
+        image_type = sniff_mime(image_bytes[:12]) or self._get_image_type(filename or "")
+        result = self._analyze(*self._encode_image(image_bytes, image_type))
+
+        if self.cache is not None:
+            self.cache.store(cache_key, result)
 
         return result
 
-    def analyze_image_bytes(self, image_bytes: bytes, filename: str = "image.jpg") -> Dict:
+    async def analyze_image_bytes_async(
+        self,
+        image_bytes: bytes,
+        filename: str = "image.jpg"
+    ) -> Dict:
         """
-        Analyze an image from bytes (useful for API uploads).
+        Analyze an image from bytes using the async provider client.
+
+        Hashing and resizing are CPU-bound, so they run in the default
+        executor rather than on the event loop.
 
         Args:
             image_bytes: Image data as bytes
-            filename: Original filename (for extension detection)
+            filename: Original filename (fallback for type detection)
 
         Returns:
             Dictionary containing mood analysis results
         """
-        # Save to temp file and analyze
-        import tempfile
+        loop = asyncio.get_running_loop()
 
-        with tempfile.NamedTemporaryFile(suffix=Path(filename).suffix, delete=False) as tmp:
-            tmp.write(image_bytes)
-            tmp_path = tmp.name
+        # Near-duplicate images reuse a previous analysis
+        cache_key = None
+        if self.cache is not None:
+            cache_key, cached = await loop.run_in_executor(None, self.cache.lookup, image_bytes)
+            if cached is not None:
+                return cached
 
-        try:
-            result = self.analyze_image(tmp_path)
-        finally:
-            os.unlink(tmp_path)
+        image_type = sniff_mime(image_bytes[:12]) or self._get_image_type(filename or "")
+        encoded = await loop.run_in_executor(None, self._encode_image, image_bytes, image_type)
+        result = await self._analyze_async(*encoded)
+
+        if self.cache is not None:
+            self.cache.store(cache_key, result)
 
         return result
+
+    async def aclose(self):
+        """Close the async HTTP client if this analyzer created it."""
+        if self._owns_http_client:
+            await self.http_client.aclose()
+
+    def save_cache(self):
+        """Persist the analysis cache to disk, if a cache path was configured."""
+        if self.cache is not None:
+            self.cache.save()
@@ -0,0 +1,232 @@
+"""
+Perceptual-hash cache for image mood analysis results.
+
+Near-duplicate uploads (re-encodes, small crops, resizes) map to nearby
+64-bit pHashes, so a Hamming-distance lookup lets them reuse a previous
+vision-model result instead of paying for another LLM round-trip.
+"""
+
+import copy
+import logging
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+
+logger = logging.getLogger(__name__)
+
+HASH_SIZE = 8
+HIGHFREQ_FACTOR = 4
+_DCT_SIZE = HASH_SIZE * HIGHFREQ_FACTOR
+
+# DCT-II basis for a 32x32 block, built once so hashing is two matrix products
+_k = np.arange(_DCT_SIZE).reshape(-1, 1)
+_n = np.arange(_DCT_SIZE).reshape(1, -1)
+_DCT_MATRIX = np.cos(np.pi * (2 * _n + 1) * _k / (2 * _DCT_SIZE))
+
+
+def perceptual_hash(image_bytes: bytes) -> Optional[int]:
+    """
+    Compute a 64-bit DCT perceptual hash of an image.
+
+    Args:
+        image_bytes: Encoded image data
+
+    Returns:
+        Hash as an unsigned 64-bit integer, or None if the image can't be decoded
+    """
+    try:
+        with Image.open(BytesIO(image_bytes)) as img:
+            # Let the JPEG decoder downsample (by up to 8x) instead of decoding
+            # every pixel of a large upload just to shrink it to 32x32
+            img.draft("L", (_DCT_SIZE * 4, _DCT_SIZE * 4))
+            small = img.convert("L").resize((_DCT_SIZE, _DCT_SIZE), Image.LANCZOS)
+    except Exception:
+        return None
+
+    pixels = np.asarray(small, dtype=np.float64)
+    dct = _DCT_MATRIX @ pixels @ _DCT_MATRIX.T
+    low_freq = dct[:HASH_SIZE, :HASH_SIZE]
+    bits = (low_freq > np.median(low_freq)).ravel()
+
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Number of differing bits between two hashes."""
+    return bin(a ^ b).count("1")
+
+
+class BKTree:
+    """Burkhard-Keller tree over integer hashes for Hamming radius queries."""
+
+    def __init__(self):
+        self._root: Optional[Tuple[int, Dict]] = None
+        self.size = 0
+
+    def add(self, value: int):
+        """Insert a hash into the tree (duplicates are ignored)."""
+        if self._root is None:
+            self._root = (value, {})
+            self.size = 1
+            return
+
+        node_value, children = self._root
+        while True:
+            distance = hamming_distance(value, node_value)
+            if distance == 0:
+                return
+            child = children.get(distance)
+            if child is None:
+                children[distance] = (value, {})
+                self.size += 1
+                return
+            node_value, children = child
+
+    def nearest(self, value: int, max_distance: int, accept=None) -> Optional[int]:
+        """
+        Find the closest stored hash within max_distance.
+
+        Args:
+            value: Query hash
+            max_distance: Maximum Hamming distance to accept
+            accept: Optional predicate; hashes it rejects are skipped
+
+        Returns:
+            Closest matching hash, or None
+        """
+        if self._root is None:
+            return None
+
+        best, best_distance = None, max_distance + 1
+        stack = [self._root]
+        while stack:
+            node_value, children = stack.pop()
+            distance = hamming_distance(value, node_value)
+            if distance < best_distance and (accept is None or accept(node_value)):
+                best, best_distance = node_value, distance
+                if distance == 0:
+                    break
+
+            # Triangle inequality: only subtrees within the search radius can match
+            radius = best_distance - 1
+            for child_distance, child in children.items():
+                if distance - radius <= child_distance <= distance + radius:
+                    stack.append(child)
+
+        return best
+
+
+class PerceptualCache:
+    """LRU cache of analysis results keyed by image perceptual hash."""
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        max_distance: int = 6,
+        path: Optional[str] = None
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            max_size: Maximum number of cached results
+            max_distance: Maximum Hamming distance for a near-duplicate hit
+            path: Optional pickle file to load from and save to
+        """
+        self.max_size = max_size
+        self.max_distance = max_distance
+        self.path = path
+        self._entries: "OrderedDict[int, Dict]" = OrderedDict()
+        self._tree = BKTree()
+        self._lock = threading.Lock()
+
+        if path and os.path.exists(path):
+            try:
+                self.load(path)
+            except Exception:
+                # A corrupt cache file shouldn't take the analyzer down with it
+                logger.exception("Failed to load mood cache from %s; starting empty", path)
+
+    def lookup(self, image_bytes: bytes) -> Tuple[Optional[int], Optional[Dict]]:
+        """
+        Look up a cached result for an image.
+
+        Args:
+            image_bytes: Encoded image data
+
+        Returns:
+            Tuple of (hash, cached result); the hash is None if the image
+            couldn't be hashed and the result is None on a miss
+        """
+        key = perceptual_hash(image_bytes)
+        if key is None:
+            return None, None
+
+        with self._lock:
+            match = self._tree.nearest(key, self.max_distance, accept=self._entries.__contains__)
+            if match is None:
+                return key, None
+            self._entries.move_to_end(match)
+            return key, copy.deepcopy(self._entries[match])
+
+    def store(self, key: Optional[int], result: Dict):
+        """Store a result under a hash returned by lookup()."""
+        if key is None:
+            return
+
+        with self._lock:
+            self._entries[key] = copy.deepcopy(result)
+            self._entries.move_to_end(key)
+            self._tree.add(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+            # BK-trees don't support deletion; rebuild once evicted hashes dominate
+            if self._tree.size > 2 * self.max_size:
+                self._rebuild()
+
+    def _rebuild(self):
+        """Rebuild the BK-tree from the live entries."""
+        self._tree = BKTree()
+        for key in self._entries:
+            self._tree.add(key)
+
+    def load(self, path: str):
+        """Load cached entries from a pickle file."""
+        with open(path, "rb") as f:
+            entries = pickle.load(f)
+
+        with self._lock:
+            self._entries = OrderedDict(entries)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            self._rebuild()
+
+    def save(self, path: Optional[str] = None):
+        """Persist cached entries to a pickle file."""
+        path = path or self.path
+        if not path:
+            return
+
+        with self._lock:
+            entries = OrderedDict(self._entries)
+
+        # Write then rename so an interrupted save never leaves a truncated file
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(entries, f)
+        os.replace(tmp_path, path)
+
+    def __len__(self) -> int:
+        return len(self._entries)
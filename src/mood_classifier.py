@@ -2,19 +2,24 @@
 Mood classification system with predefined mood categories and attributes.
 """
 
-from typing import Dict, List, Set
+import functools
+from typing import Dict, FrozenSet, List, Set, Tuple
 from dataclasses import dataclass
 
+import numpy as np
 
-@dataclass
+from .mood_kernels import similar_mask
+
+
+@dataclass(frozen=True)
 class Mood:
-    """Represents a mood with its musical attributes."""
+    """Represents a mood with its musical attributes (immutable and hashable)."""
     name: str
     energy: float  # 0.0 to 1.0
     valence: float  # 0.0 (negative) to 1.0 (positive)
     tempo_range: tuple  # (min_bpm, max_bpm)
-    genres: List[str]
-    keywords: List[str]
+    genres: Tuple[str, ...]
+    keywords: Tuple[str, ...]
 
 
 class MoodClassifier:
@@ -26,84 +31,93 @@ class MoodClassifier:
             energy=0.2,
             valence=0.6,
             tempo_range=(60, 90),
-            genres=["ambient", "chill", "lo-fi", "classical", "acoustic"],
-            keywords=["peaceful", "serene", "tranquil", "relaxing", "soft", "gentle"]
+            genres=("ambient", "chill", "lo-fi", "classical", "acoustic"),
+            keywords=("peaceful", "serene", "tranquil", "relaxing", "soft", "gentle")
         ),
         "energetic": Mood(
             name="energetic",
             energy=0.9,
             valence=0.8,
             tempo_range=(120, 180),
-            genres=["edm", "pop", "rock", "electronic", "dance"],
-            keywords=["upbeat", "vibrant", "dynamic", "lively", "fast", "intense"]
+            genres=("edm", "pop", "rock", "electronic", "dance"),
+            keywords=("upbeat", "vibrant", "dynamic", "lively", "fast", "intense")
         ),
         "romantic": Mood(
             name="romantic",
             energy=0.4,
             valence=0.7,
             tempo_range=(70, 100),
-            genres=["r&b", "soul", "jazz", "classical", "love songs"],
-            keywords=["love", "passion", "tender", "intimate", "warm", "dreamy"]
+            genres=("r&b", "soul", "jazz", "classical", "love songs"),
+            keywords=("love", "passion", "tender", "intimate", "warm", "dreamy")
         ),
         "dark": Mood(
             name="dark",
             energy=0.6,
             valence=0.2,
             tempo_range=(80, 120),
-            genres=["industrial", "metal", "dark ambient", "goth", "techno"],
-            keywords=["mysterious", "ominous", "heavy", "brooding", "shadows", "intense"]
+            genres=("industrial", "metal", "dark ambient", "goth", "techno"),
+            keywords=("mysterious", "ominous", "heavy", "brooding", "shadows", "intense")
         ),
         "melancholic": Mood(
             name="melancholic",
             energy=0.3,
             valence=0.3,
             tempo_range=(60, 85),
-            genres=["indie", "folk", "blues", "sad", "alternative"],
-            keywords=["sad", "nostalgic", "reflective", "lonely", "wistful", "somber"]
+            genres=("indie", "folk", "blues", "sad", "alternative"),
+            keywords=("sad", "nostalgic", "reflective", "lonely", "wistful", "somber")
         ),
         "joyful": Mood(
             name="joyful",
             energy=0.8,
             valence=0.9,
             tempo_range=(110, 140),
-            genres=["pop", "funk", "disco", "happy", "uplifting"],
-            keywords=["happy", "cheerful", "bright", "sunny", "playful", "optimistic"]
+            genres=("pop", "funk", "disco", "happy", "uplifting"),
+            keywords=("happy", "cheerful", "bright", "sunny", "playful", "optimistic")
         ),
         "mysterious": Mood(
             name="mysterious",
             energy=0.5,
             valence=0.5,
             tempo_range=(70, 110),
-            genres=["ambient", "electronic", "experimental", "cinematic"],
-            keywords=["enigmatic", "atmospheric", "ethereal", "curious", "haunting"]
+            genres=("ambient", "electronic", "experimental", "cinematic"),
+            keywords=("enigmatic", "atmospheric", "ethereal", "curious", "haunting")
         ),
         "aggressive": Mood(
             name="aggressive",
             energy=0.95,
             valence=0.3,
             tempo_range=(140, 200),
-            genres=["metal", "hardcore", "punk", "hard rock", "drum and bass"],
-            keywords=["powerful", "fierce", "raw", "angry", "intense", "chaotic"]
+            genres=("metal", "hardcore", "punk", "hard rock", "drum and bass"),
+            keywords=("powerful", "fierce", "raw", "angry", "intense", "chaotic")
         ),
         "dreamy": Mood(
             name="dreamy",
             energy=0.3,
             valence=0.7,
             tempo_range=(70, 95),
-            genres=["ambient", "dream pop", "shoegaze", "indie", "chillwave"],
-            keywords=["floating", "surreal", "hazy", "ethereal", "soft", "otherworldly"]
+            genres=("ambient", "dream pop", "shoegaze", "indie", "chillwave"),
+            keywords=("floating", "surreal", "hazy", "ethereal", "soft", "otherworldly")
         ),
         "uplifting": Mood(
             name="uplifting",
             energy=0.7,
             valence=0.85,
             tempo_range=(100, 130),
-            genres=["trance", "progressive", "inspirational", "gospel", "anthemic"],
-            keywords=["inspiring", "hopeful", "motivating", "euphoric", "empowering"]
+            genres=("trance", "progressive", "inspirational", "gospel", "anthemic"),
+            keywords=("inspiring", "hopeful", "motivating", "euphoric", "empowering")
         )
     }
 
+    # (energy, valence) coordinates and names in MOODS order, for vectorized
+    # similarity queries. float64 keeps threshold comparisons identical to
+    # the scalar math for moods that sit exactly on the boundary.
+    _EV = np.array([[m.energy, m.valence] for m in MOODS.values()], dtype=np.float64)
+    _NAMES = np.array(list(MOODS.keys()))
+    _MOOD_NAMES = tuple(MOODS.keys())
+    _MOOD_NAMES_SET: FrozenSet[str] = frozenset(MOODS.keys())
+
     @classmethod
+    @functools.lru_cache(maxsize=256)
     def get_mood(cls, mood_name: str) -> Mood:
         """Get mood object by name."""
         return cls.MOODS.get(mood_name.lower())
@@ -114,9 +128,14 @@ class MoodClassifier:
         return cls.MOODS
 
     @classmethod
-    def get_mood_names(cls) -> List[str]:
-        """Get list of all mood names."""
-        return list(cls.MOODS.keys())
+    def get_mood_names(cls) -> Tuple[str, ...]:
+        """Get all mood names (cached, immutable)."""
+        return cls._MOOD_NAMES
+
+    @classmethod
+    def is_valid_mood(cls, mood_name: str) -> bool:
+        """Check whether a mood name exists (constant time)."""
+        return mood_name in cls._MOOD_NAMES_SET
 
     @classmethod
     def find_similar_moods(cls, mood_name: str, threshold: float = 0.3) -> List[str]:
@@ -134,23 +153,19 @@ class MoodClassifier:
         if not reference_mood:
             return []
 
-        similar = []
-        for name, mood in cls.MOODS.items():
-            if name == mood_name:
-                continue
-
-            # Calculate Euclidean distance in energy-valence space
-            distance = (
-                (mood.energy - reference_mood.energy) ** 2 +
-                (mood.valence - reference_mood.valence) ** 2
-            ) ** 0.5
-
-            if distance <= threshold:
-                similar.append(name)
+        # Squared Euclidean distance in energy-valence space
+        mask = similar_mask(
+            cls._EV,
+            reference_mood.energy,
+            reference_mood.valence,
+            threshold * threshold
+        )
+        mask &= cls._NAMES != reference_mood.name
 
-        return similar
+        return cls._NAMES[mask].tolist()
 
     @classmethod
+    @functools.lru_cache(maxsize=256)
     def get_mood_description(cls, mood_name: str) -> str:
         """Get a human-readable description of a mood."""
         mood = cls.get_mood(mood_name)
@@ -0,0 +1,45 @@
+"""
+Compiled numeric kernels for mood similarity queries.
+
+Numba is optional: without it the kernels use the equivalent vectorized
+numpy expressions, which beat an uncompiled element-wise loop.
+"""
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # pragma: no cover - depends on optional dependency
+    njit = None
+
+
+def _similar_mask_numpy(ev, ref_e, ref_v, t2):
+    """Vectorized fallback for similar_mask when numba is unavailable."""
+    distances = ((ev - np.array([ref_e, ref_v])) ** 2).sum(axis=1)
+    return distances <= t2
+
+
+def _similar_mask_loop(ev, ref_e, ref_v, t2):
+    """
+    Mark rows of an (N, 2) energy-valence matrix within a squared distance.
+
+    Args:
+        ev: (N, 2) array of (energy, valence) coordinates
+        ref_e: Reference energy
+        ref_v: Reference valence
+        t2: Squared distance threshold
+
+    Returns:
+        Boolean array of length N
+    """
+    out = np.empty(ev.shape[0], np.bool_)
+    for i in range(ev.shape[0]):
+        de = ev[i, 0] - ref_e
+        dv = ev[i, 1] - ref_v
+        out[i] = (de * de + dv * dv) <= t2
+    return out
+
+
+# The loop only pays off once JIT-compiled (on first call, then cached on
+# disk); plain Python would index numpy scalars element by element
+similar_mask = njit(cache=True)(_similar_mask_loop) if njit else _similar_mask_numpy
@@ -2,16 +2,101 @@
 Music matcher using Spotify API to find and recommend music based on detected moods.
 """
 
+import asyncio
+import copy
+import functools
+import itertools
+import logging
 import os
-from typing import Dict, List, Optional
+import threading
+import time
+from types import MappingProxyType
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Mapping, Optional, Set, Tuple
+import orjson
+import requests
 import spotipy
+from cachetools import TTLCache
+from requests.adapters import HTTPAdapter
 from spotipy.oauth2 import SpotifyClientCredentials
+from urllib3.util.retry import Retry
 
 from .mood_classifier import MoodClassifier, Mood
 
 
+logger = logging.getLogger(__name__)
+
+# Stay under Spotify's rolling rate limit for app (client credentials) tokens
+SPOTIFY_MAX_REQUESTS_PER_SECOND = 25
+
+# Threads shared by all fan-out (strategies, genre fallback, secondary moods)
+MATCHER_MAX_WORKERS = 8
+
+
+@functools.lru_cache(maxsize=None)
+def _mood_params(mood: Mood) -> Mapping:
+    """Convert mood attributes to Spotify search parameters (memoized per mood)."""
+    return MappingProxyType({
+        "target_energy": mood.energy,
+        "target_valence": mood.valence,
+        "min_tempo": mood.tempo_range[0],
+        "max_tempo": mood.tempo_range[1],
+    })
+
+
+class _RateLimiter:
+    """Thread-safe token bucket that spaces out outgoing requests."""
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request may be sent."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity,
+                    self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class _ThrottledAdapter(HTTPAdapter):
+    """HTTPAdapter that takes a rate-limiter token before each request."""
+
+    def __init__(self, limiter: _RateLimiter, **kwargs):
+        self._limiter = limiter
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        self._limiter.acquire()
+        return super().send(request, **kwargs)
+
+
+def _orjson_response_hook(response, *args, **kwargs):
+    """Make response.json() decode with orjson; spotipy parses every reply through it."""
+    response.json = lambda **_: orjson.loads(response.content)
+    return response
+
+
 class MusicMatcher:
-    """Matches detected moods to music recommendations using Spotify."""
+    """
+    Matches detected moods to music recommendations using Spotify.
+
+    Instances own a thread pool, an HTTP session and a recommendation cache,
+    so create one per process and reuse it; call close() (or use it as a
+    context manager) when done.
+    """
 
     def __init__(self, client_id: Optional[str] = None, client_secret: Optional[str] = None):
         """
@@ -30,26 +115,172 @@ class MusicMatcher:
                 "SPOTIFY_CLIENT_SECRET environment variables or pass them to __init__"
             )
 
+        self._client_id = client_id
+        self._client_secret = client_secret
+
+        # Recommendations per (mood, limit, market) barely change over minutes
+        self._reco_cache: TTLCache = TTLCache(maxsize=256, ttl=900)
+        self._reco_lock = threading.Lock()
+
+        # The HTTP session and spotipy client are built on first use, so
+        # callers that never hit the API (e.g. create_playlist_url) skip it
+        self._session: Optional[requests.Session] = None
+        self._spotify: Optional[spotipy.Spotify] = None
+        self._client_lock = threading.Lock()
+
+        # One pool reused by every fan-out site instead of a pool per call
+        self._executor = ThreadPoolExecutor(
+            max_workers=MATCHER_MAX_WORKERS,
+            thread_name_prefix="music-matcher"
+        )
+
+    def _gather(self, calls: List[Callable[[], Any]]) -> List[Future]:
+        """
+        Run calls concurrently on the shared executor.
+
+        A call that no worker has picked up by the time it is waited on is
+        cancelled and run on the calling thread instead. Nested fan-out (a
+        secondary mood running its strategies from a pool worker) therefore
+        never blocks a worker on tasks queued behind it, which could starve
+        the bounded pool and deadlock.
+
+        Args:
+            calls: Zero-argument callables
+
+        Returns:
+            Completed futures, in the same order as calls
+        """
+        futures = [self._executor.submit(call) for call in calls]
+        for i, call in enumerate(calls):
+            if futures[i].cancel():
+                futures[i] = Future()
+                try:
+                    futures[i].set_result(call())
+                except Exception as e:
+                    futures[i].set_exception(e)
+            else:
+                futures[i].exception()  # Wait without raising
+        return futures
+
+    @property
+    def spotify(self) -> spotipy.Spotify:
+        """Spotify client, created on first access."""
+        if self._spotify is None:
+            with self._client_lock:
+                if self._spotify is None:
+                    self._spotify = self._create_client()
+        return self._spotify
+
+    def _create_client(self) -> spotipy.Spotify:
+        """Build the pooled HTTP session and the spotipy client on top of it."""
+        # One pooled session so token and API calls reuse keep-alive connections.
+        # 429/5xx responses are retried with exponential backoff, honoring
+        # Retry-After, and all requests share one rate limiter.
+        retry = Retry(
+            total=5,
+            backoff_factor=0.5,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=["GET", "POST"],
+            respect_retry_after_header=True
+        )
+        self._session = requests.Session()
+        adapter = _ThrottledAdapter(
+            _RateLimiter(SPOTIFY_MAX_REQUESTS_PER_SECOND),
+            pool_connections=10,
+            pool_maxsize=20,
+            max_retries=retry
+        )
+        self._session.mount("https://", adapter)
+        self._session.hooks["response"].append(_orjson_response_hook)
+
         auth_manager = SpotifyClientCredentials(
-            client_id=client_id,
-            client_secret=client_secret
+            client_id=self._client_id,
+            client_secret=self._client_secret,
+            requests_session=self._session
+        )
+        return spotipy.Spotify(
+            auth_manager=auth_manager,
+            requests_session=self._session
         )
-        self.spotify = spotipy.Spotify(auth_manager=auth_manager)
 
-    def _get_mood_search_params(self, mood: Mood) -> Dict:
-        """Convert mood attributes to Spotify search parameters."""
-        return {
-            "target_energy": mood.energy,
-            "target_valence": mood.valence,
-            "min_tempo": mood.tempo_range[0],
-            "max_tempo": mood.tempo_range[1],
-        }
+    def close(self):
+        """Shut down the worker pool and close the HTTP session, if one was created."""
+        self._executor.shutdown(wait=True)
+        if self._session is not None:
+            self._session.close()
+
+    def __enter__(self) -> "MusicMatcher":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _search_genre(self, genre: str, limit: int, market: str) -> List[Dict]:
+        """Search tracks for a single genre and return them formatted."""
+        results = self.spotify.search(
+            q=f"genre:{genre}",
+            type="track",
+            limit=limit,
+            market=market
+        )
+        return [self._format_track(item) for item in results['tracks']['items']]
+
+    def _search_genres(self, genres: Tuple[str, ...], limit: int, market: str) -> List[Dict]:
+        """Search tracks matching any of several genres in a single request."""
+        query = " OR ".join(f'genre:"{genre}"' for genre in genres)
+        results = self.spotify.search(
+            q=query,
+            type="track",
+            limit=limit,
+            market=market
+        )
+        return [self._format_track(item) for item in results['tracks']['items']]
+
+    def _strategy_genre_search(self, mood: Mood, limit: int, market: str) -> List[Dict]:
+        """Strategy 1: search up to `limit` tracks by the mood's top genres."""
+        genres = mood.genres[:2]  # Use top 2 genres
+        if not genres or limit <= 0:
+            return []
+
+        # One OR query across the top genres instead of one request per genre
+        tracks = self._search_genres(genres, limit, market)
+
+        # Fall back to per-genre searches (issued concurrently), splitting the
+        # remaining budget evenly, if the combined query comes back thin
+        if len(tracks) < limit / 2:
+            per_genre_limit = -(-(limit - len(tracks)) // len(genres))
+            seen = {track["uri"] for track in tracks}
+            for future in self._gather([
+                functools.partial(self._search_genre, genre, per_genre_limit, market)
+                for genre in genres
+            ]):
+                for track in future.result():
+                    if track["uri"] not in seen:
+                        seen.add(track["uri"])
+                        tracks.append(track)
+
+        # Stay within budget so the recommendations strategy keeps its share
+        return tracks[:limit]
+
+    def _strategy_recommendations(self, mood: Mood, limit: int, market: str) -> List[Dict]:
+        """Strategy 2: up to `limit` Spotify recommendations from seed genres and audio features."""
+        if not mood.genres or limit <= 0:
+            return []
+
+        recommendations = self.spotify.recommendations(
+            seed_genres=mood.genres[:5],  # Spotify allows max 5 seed genres
+            limit=min(100, limit),
+            market=market,
+            **_mood_params(mood)
+        )
+        return [self._format_track(item) for item in recommendations['tracks']]
 
     def get_recommendations_by_mood(
         self,
         mood_name: str,
         limit: int = 20,
-        market: str = "US"
+        market: str = "US",
+        exclude_uris: Optional[Set[str]] = None
     ) -> Dict:
         """
         Get music recommendations for a specific mood.
@@ -58,6 +289,7 @@ class MusicMatcher:
             mood_name: Name of the mood
             limit: Number of tracks to return (max 100)
             market: Spotify market/country code
+            exclude_uris: Track URIs to leave out of the result (optional)
 
         Returns:
             Dictionary with tracks and playlist info
@@ -66,51 +298,61 @@ class MusicMatcher:
         if not mood:
             raise ValueError(f"Unknown mood: {mood_name}")
 
-        tracks = []
-
-        # Strategy 1: Search by genre and mood keywords
-        for genre in mood.genres[:2]:  # Use top 2 genres
-            query = f"genre:{genre}"
-            results = self.spotify.search(
-                q=query,
-                type="track",
-                limit=min(10, limit // 2),
-                market=market
-            )
-
-            for item in results['tracks']['items']:
-                tracks.append(self._format_track(item))
-
-        # Strategy 2: Get recommendations using seed genres and audio features
-        if len(mood.genres) > 0:
-            seed_genres = mood.genres[:5]  # Spotify allows max 5 seed genres
-            params = self._get_mood_search_params(mood)
-
-            try:
-                recommendations = self.spotify.recommendations(
-                    seed_genres=seed_genres,
-                    limit=min(20, limit),
-                    market=market,
-                    **params
-                )
-
-                for item in recommendations['tracks']:
-                    track = self._format_track(item)
-                    if track not in tracks:  # Avoid duplicates
-                        tracks.append(track)
-
-            except Exception as e:
-                print(f"Recommendation error: {e}")
+        if exclude_uris:
+            # Spotify can't exclude URIs server-side, so over-fetch and filter
+            # here; the unfiltered fetch is what gets cached and shared. The
+            # over-fetch is capped at limit so a large exclude set can't
+            # balloon the request
+            fetch_limit = min(100, limit + min(len(exclude_uris), limit))
+            result = self.get_recommendations_by_mood(mood_name, limit=fetch_limit, market=market)
+            result["tracks"] = [
+                track for track in result["tracks"] if track["uri"] not in exclude_uris
+            ][:limit]
+            result["track_count"] = len(result["tracks"])
+            return result
+
+        # Return copies so callers can't mutate the cached result
+        cache_key = (mood_name, limit, market)
+        with self._reco_lock:
+            cached = self._reco_cache.get(cache_key)
+        if cached is not None:
+            return copy.deepcopy(cached)
+
+        # Split the limit between the strategies up front so Spotify only
+        # returns what we keep, rather than over-fetching and truncating
+        genre_budget = min(limit // 2, 10 * len(mood.genres[:2]))
+        recommendation_budget = max(0, limit - genre_budget)
+
+        # The two strategies are independent network calls; run them concurrently
+        complete = True
+        genre_future, recommendations_future = self._gather([
+            functools.partial(self._strategy_genre_search, mood, genre_budget, market),
+            functools.partial(self._strategy_recommendations, mood, recommendation_budget, market)
+        ])
+
+        strategy_results = [genre_future.result()]
+        try:
+            strategy_results.append(recommendations_future.result())
+        except Exception:
+            logger.warning("Recommendation error for %s", mood_name, exc_info=True)
+            complete = False
+
+        tracks, seen = [], set()
+        for strategy_tracks in strategy_results:
+            for track in strategy_tracks:
+                if track["uri"] not in seen:  # Avoid duplicates
+                    seen.add(track["uri"])
+                    tracks.append(track)
 
         # Limit to requested number
         tracks = tracks[:limit]
 
-        return {
+        result = {
             "mood": mood_name,
             "mood_description": MoodClassifier.get_mood_description(mood_name),
             "track_count": len(tracks),
             "tracks": tracks,
-            "genres": mood.genres,
+            "genres": list(mood.genres),
             "audio_attributes": {
                 "energy": mood.energy,
                 "valence": mood.valence,
@@ -118,6 +360,54 @@ class MusicMatcher:
             }
         }
 
+        # Don't pin a partial result from a transient failure for the full TTL
+        if complete:
+            with self._reco_lock:
+                self._reco_cache[cache_key] = copy.deepcopy(result)
+
+        return result
+
+    def _split_limit(self, limit: int, secondary_count: int) -> Tuple[int, int]:
+        """Split a track budget into primary and per-secondary-mood limits."""
+        primary_limit = int(limit * 0.6)  # 60% for primary
+        secondary_limit = limit - primary_limit
+        tracks_per_secondary = secondary_limit // secondary_count if secondary_count else 0
+        return primary_limit, tracks_per_secondary
+
+    def _combine_results(
+        self,
+        primary_mood: str,
+        secondary_moods: List[str],
+        primary_results: Dict,
+        secondary_results: List[Dict],
+        limit: int
+    ) -> Dict:
+        """Merge primary and secondary mood recommendations into one response."""
+        all_genres = set(primary_results["genres"])
+        for results in secondary_results:
+            all_genres.update(results["genres"])
+
+        # Walk primary then secondary tracks lazily and stop as soon as the
+        # limit is reached, so extra secondary moods cost nothing
+        all_tracks, seen = [], set()
+        for track in itertools.chain.from_iterable(
+            results["tracks"] for results in itertools.chain([primary_results], secondary_results)
+        ):
+            if len(all_tracks) >= limit:
+                break
+            if track["uri"] in seen:
+                continue
+            seen.add(track["uri"])
+            all_tracks.append(track)
+
+        return {
+            "primary_mood": primary_mood,
+            "secondary_moods": secondary_moods,
+            "track_count": len(all_tracks),
+            "tracks": all_tracks,
+            "genres": list(all_genres)
+        }
+
     def get_multi_mood_recommendations(
         self,
         primary_mood: str,
@@ -138,39 +428,83 @@ class MusicMatcher:
         secondary_moods = secondary_moods or []
 
         # Get more tracks for primary mood
-        primary_limit = int(limit * 0.6)  # 60% for primary
-        secondary_limit = limit - primary_limit
+        primary_limit, tracks_per_secondary = self._split_limit(limit, len(secondary_moods))
 
         primary_results = self.get_recommendations_by_mood(
             primary_mood,
             limit=primary_limit
         )
 
-        all_tracks = primary_results["tracks"]
-        all_genres = set(primary_results["genres"])
+        # Secondary moods often share genres with the primary; skip tracks it
+        # already returned so their share of the limit goes to new tracks
+        primary_uris = {track["uri"] for track in primary_results["tracks"]}
+
+        # Each secondary mood is an independent set of Spotify calls; fetch them concurrently
+        secondary_futures = self._gather([
+            functools.partial(
+                self.get_recommendations_by_mood,
+                mood_name,
+                limit=tracks_per_secondary,
+                exclude_uris=primary_uris
+            )
+            for mood_name in secondary_moods
+        ])
 
         # Add tracks from secondary moods
-        if secondary_moods:
-            tracks_per_secondary = secondary_limit // len(secondary_moods)
+        secondary_results = []
+        for mood_name, future in zip(secondary_moods, secondary_futures):
+            try:
+                secondary_results.append(future.result())
+            except Exception:
+                logger.warning("Error getting recommendations for %s", mood_name, exc_info=True)
 
-            for mood_name in secondary_moods:
-                try:
-                    results = self.get_recommendations_by_mood(
-                        mood_name,
-                        limit=tracks_per_secondary
-                    )
-                    all_tracks.extend(results["tracks"])
-                    all_genres.update(results["genres"])
-                except Exception as e:
-                    print(f"Error getting recommendations for {mood_name}: {e}")
+        return self._combine_results(
+            primary_mood, secondary_moods, primary_results, secondary_results, limit
+        )
 
-        return {
-            "primary_mood": primary_mood,
-            "secondary_moods": secondary_moods,
-            "track_count": len(all_tracks),
-            "tracks": all_tracks[:limit],
-            "genres": list(all_genres)
-        }
+    async def _run_sync(self, func, *args, **kwargs):
+        """Run a blocking spotipy call in the default executor."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+    async def get_recommendations_by_mood_async(
+        self,
+        mood_name: str,
+        limit: int = 20,
+        market: str = "US"
+    ) -> Dict:
+        """
+        Async version of get_recommendations_by_mood.
+
+        The Spotify calls still go through spotipy (with its pooled, retrying
+        session) on a worker thread; inside, the genre searches and strategies
+        already fan out concurrently.
+        """
+        return await self._run_sync(
+            self.get_recommendations_by_mood,
+            mood_name,
+            limit=limit,
+            market=market
+        )
+
+    async def get_multi_mood_recommendations_async(
+        self,
+        primary_mood: str,
+        secondary_moods: List[str] = None,
+        limit: int = 30
+    ) -> Dict:
+        """
+        Async version of get_multi_mood_recommendations.
+
+        Runs the sync method on a worker thread; it already fans the
+        secondary moods out on the matcher's own pool.
+        """
+        return await self._run_sync(
+            self.get_multi_mood_recommendations,
+            primary_mood,
+            secondary_moods,
+            limit=limit
+        )
 
     def create_playlist_url(self, track_uris: List[str]) -> str:
         """
@@ -185,8 +519,9 @@ class MusicMatcher:
         Returns:
             URL to open tracks in Spotify
         """
-        # Extract track IDs from URIs
-        track_ids = [uri.split(":")[-1] for uri in track_uris[:100]]  # Max 100
+        # Extract track IDs from URIs (slicing after the last ":" avoids a
+        # throwaway list per URI from split)
+        track_ids = [uri[uri.rfind(":") + 1:] for uri in track_uris[:100]]  # Max 100
 
         # Create a comma-separated list
         ids_str = ",".join(track_ids)
@@ -195,15 +530,17 @@ class MusicMatcher:
 
     def _format_track(self, track: Dict) -> Dict:
         """Format Spotify track data for response."""
+        album = track["album"]
+        images = album["images"]
         return {
             "name": track["name"],
-            "artist": ", ".join([artist["name"] for artist in track["artists"]]),
-            "album": track["album"]["name"],
+            "artist": ", ".join(artist["name"] for artist in track["artists"]),
+            "album": album["name"],
             "uri": track["uri"],
             "url": track["external_urls"]["spotify"],
             "preview_url": track.get("preview_url"),
             "duration_ms": track["duration_ms"],
-            "image": track["album"]["images"][0]["url"] if track["album"]["images"] else None
+            "image": images[0]["url"] if images else None
         }
 
     def search_playlist_by_mood(self, mood_name: str, limit: int = 10) -> List[Dict]:
@@ -222,7 +559,7 @@ class MusicMatcher:
             raise ValueError(f"Unknown mood: {mood_name}")
 
         # Search using mood keywords
-        search_terms = [mood_name] + mood.keywords[:2]
+        search_terms = [mood_name, *mood.keywords[:2]]
         query = " ".join(search_terms)
 
         results = self.spotify.search(
@@ -243,3 +580,7 @@ class MusicMatcher:
             })
 
         return playlists
+
+    async def search_playlist_by_mood_async(self, mood_name: str, limit: int = 10) -> List[Dict]:
+        """Async version of search_playlist_by_mood."""
+        return await self._run_sync(self.search_playlist_by_mood, mood_name, limit=limit)
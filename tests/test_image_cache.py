@@ -0,0 +1,154 @@
+"""
+Tests for the perceptual-hash cache.
+"""
+
+import os
+import random
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+from src.image_cache import BKTree, PerceptualCache, hamming_distance, perceptual_hash
+
+
+def _brute_force_nearest(values, query, max_distance):
+    """Smallest distance within max_distance, or None."""
+    distances = [hamming_distance(query, value) for value in values]
+    within = [d for d in distances if d <= max_distance]
+    return min(within) if within else None
+
+
+def _pattern_image(seed: int, size: int = 640) -> Image.Image:
+    """Smooth random pattern; different seeds give far-apart hashes."""
+    rng = np.random.default_rng(seed)
+    coarse = rng.integers(0, 256, (8, 8, 3), dtype=np.uint8)
+    return Image.fromarray(coarse).resize((size, size), Image.BICUBIC)
+
+
+def _encode(img: Image.Image, fmt: str = "PNG", **kwargs) -> bytes:
+    buffer = BytesIO()
+    img.save(buffer, fmt, **kwargs)
+    return buffer.getvalue()
+
+
+def test_bktree_nearest_matches_brute_force():
+    rng = random.Random(0)
+    values = [rng.getrandbits(64) for _ in range(500)]
+    # Add near neighbours so small radii have something to find
+    values += [v ^ (1 << rng.randrange(64)) ^ (1 << rng.randrange(64)) for v in values[:100]]
+
+    tree = BKTree()
+    for value in values:
+        tree.add(value)
+
+    for _ in range(300):
+        base = rng.choice(values)
+        query = base
+        for _ in range(rng.randrange(10)):
+            query ^= 1 << rng.randrange(64)
+        max_distance = rng.randrange(12)
+
+        found = tree.nearest(query, max_distance)
+        expected = _brute_force_nearest(values, query, max_distance)
+        if expected is None:
+            assert found is None
+        else:
+            assert hamming_distance(query, found) == expected
+
+
+def test_bktree_nearest_respects_accept():
+    tree = BKTree()
+    for value in (0b0000, 0b0001, 0b0011):
+        tree.add(value)
+
+    assert tree.nearest(0b0000, 2) == 0b0000
+    assert tree.nearest(0b0000, 2, accept=lambda v: v != 0b0000) == 0b0001
+    assert tree.nearest(0b0000, 0, accept=lambda v: v != 0b0000) is None
+
+
+def test_bktree_ignores_duplicates():
+    tree = BKTree()
+    tree.add(42)
+    tree.add(42)
+    assert tree.size == 1
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / "cache.pkl")
+    cache = PerceptualCache(path=path)
+    cache.store(123, {"primary_mood": "calm"})
+    cache.save()
+
+    assert not os.path.exists(path + ".tmp")
+    assert len(PerceptualCache(path=path)) == 1
+
+
+def test_corrupt_cache_file_starts_empty(tmp_path):
+    path = tmp_path / "cache.pkl"
+    cache = PerceptualCache(path=str(path))
+    cache.store(123, {"primary_mood": "calm"})
+    cache.save()
+    path.write_bytes(path.read_bytes()[:10])  # Simulate an interrupted save
+
+    assert len(PerceptualCache(path=str(path))) == 0
+
+
+def test_reencoded_jpeg_hits_cache():
+    cache = PerceptualCache(max_size=8, max_distance=6)
+    original = _pattern_image(1)
+
+    key, result = cache.lookup(_encode(original))
+    assert result is None
+    cache.store(key, {"primary_mood": "calm"})
+
+    # Same picture, recompressed and resized: a near-duplicate upload
+    reencoded = _encode(original.resize((500, 500)), "JPEG", quality=60)
+    _, result = cache.lookup(reencoded)
+    assert result == {"primary_mood": "calm"}
+
+
+def test_cache_returns_copies():
+    cache = PerceptualCache(max_size=8, max_distance=6)
+    data = _encode(_pattern_image(1))
+    key, _ = cache.lookup(data)
+    cache.store(key, {"secondary_moods": ["dreamy"]})
+
+    _, first = cache.lookup(data)
+    first["secondary_moods"].append("mutated")
+    _, second = cache.lookup(data)
+    assert second == {"secondary_moods": ["dreamy"]}
+
+
+def test_lru_eviction_and_lookup_after_eviction_misses():
+    images = [_encode(_pattern_image(seed)) for seed in range(3)]
+    hashes = [perceptual_hash(data) for data in images]
+    # The patterns must be far apart for a miss to mean "evicted"
+    assert min(hamming_distance(a, b) for i, a in enumerate(hashes) for b in hashes[i + 1:]) > 6
+
+    cache = PerceptualCache(max_size=2, max_distance=6)
+    for i, data in enumerate(images[:2]):
+        key, _ = cache.lookup(data)
+        cache.store(key, {"index": i})
+
+    # Touch image 0 so image 1 becomes least recently used
+    assert cache.lookup(images[0])[1] == {"index": 0}
+
+    key, _ = cache.lookup(images[2])
+    cache.store(key, {"index": 2})
+
+    assert len(cache) == 2
+    # Image 1's hash is still in the BK-tree; the accept filter must skip it
+    assert cache.lookup(images[1])[1] is None
+    assert cache.lookup(images[0])[1] == {"index": 0}
+    assert cache.lookup(images[2])[1] == {"index": 2}
+
+
+def test_undecodable_image_is_not_cached():
+    cache = PerceptualCache(max_size=8, max_distance=6)
+
+    key, result = cache.lookup(b"not an image")
+    cache.store(key, {"primary_mood": "calm"})
+
+    assert (key, result) == (None, None)
+    assert len(cache) == 0
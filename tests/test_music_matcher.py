@@ -0,0 +1,105 @@
+"""
+Tests for MusicMatcher's shared-pool fan-out.
+"""
+
+import sys
+import threading
+import time
+
+import pytest
+
+import src.music_matcher as music_matcher
+from src.music_matcher import MusicMatcher
+
+
+def _track(uri: str) -> dict:
+    return {
+        "name": uri,
+        "artists": [{"name": "Artist"}],
+        "album": {"name": "Album", "images": []},
+        "uri": uri,
+        "external_urls": {"spotify": "https://open.spotify.com/track/x"},
+        "preview_url": None,
+        "duration_ms": 1000
+    }
+
+
+class FakeSpotify:
+    """Minimal stand-in for spotipy.Spotify that returns predictable tracks."""
+
+    def search(self, q, type, limit, market=None, **kwargs):
+        return {"tracks": {"items": [_track(f"spotify:track:{q}:{i}") for i in range(limit)]}}
+
+    def recommendations(self, seed_genres, limit, market=None, **kwargs):
+        seed = ",".join(seed_genres)
+        return {"tracks": [_track(f"spotify:track:{seed}:{i}") for i in range(limit)]}
+
+
+@pytest.fixture
+def small_matcher(monkeypatch):
+    """Matcher with a 2-thread pool and a fake Spotify client."""
+    monkeypatch.setattr(music_matcher, "MATCHER_MAX_WORKERS", 2)
+    matcher = MusicMatcher(client_id="id", client_secret="secret")
+    matcher._spotify = FakeSpotify()
+    yield matcher
+    # Cancel anything still queued so a deadlocked pool fails the test
+    # instead of hanging close() (cancel_futures needs Python 3.9+)
+    if sys.version_info >= (3, 9):
+        matcher._executor.shutdown(wait=False, cancel_futures=True)
+    matcher.close()
+
+
+def _run_with_timeout(target, count: int, timeout: float = 5.0):
+    """Run target(i) on `count` threads; return how many are still alive after timeout."""
+    threads = [threading.Thread(target=target, args=(i,), daemon=True) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + timeout
+    for thread in threads:
+        thread.join(max(0.0, deadline - time.monotonic()))
+    return sum(thread.is_alive() for thread in threads)
+
+
+def test_gather_preserves_order_and_captures_errors(small_matcher):
+    def fail():
+        raise RuntimeError("boom")
+
+    futures = small_matcher._gather([lambda: 1, fail, lambda: 3])
+
+    assert all(future.done() for future in futures)
+    assert futures[0].result() == 1
+    assert isinstance(futures[1].exception(), RuntimeError)
+    assert futures[2].result() == 3
+
+
+def test_gather_nested_fan_out_does_not_deadlock(small_matcher):
+    def fan_out(depth: int) -> int:
+        if depth == 0:
+            return 1
+        futures = small_matcher._gather([lambda: fan_out(depth - 1) for _ in range(3)])
+        return sum(future.result() for future in futures)
+
+    results = []
+    alive = _run_with_timeout(lambda i: results.append(fan_out(3)), count=8)
+
+    assert alive == 0
+    assert results == [27] * 8
+
+
+def test_concurrent_multi_mood_recommendations_complete(small_matcher):
+    results = []
+
+    def run(i):
+        small_matcher._reco_cache.clear()
+        results.append(small_matcher.get_multi_mood_recommendations(
+            "calm", ["dreamy", "romantic", "energetic"], limit=30
+        ))
+
+    alive = _run_with_timeout(run, count=12)
+
+    assert alive == 0
+    assert len(results) == 12
+    for result in results:
+        uris = [track["uri"] for track in result["tracks"]]
+        assert 0 < len(uris) <= 30
+        assert len(uris) == len(set(uris))